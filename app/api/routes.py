@@ -2,6 +2,7 @@
 import jwt
 from fastapi import APIRouter, HTTPException, Query
 
+from app.config import settings
 from app.database import fetch_agent_sessions, fetch_challenge_history
 from app.services.token import decode_token
 
@@ -10,7 +11,6 @@ router = APIRouter()
 
 @router.get("/status")
 async def status():
-    from app.config import settings
     return {
         "status": "ok",
         "service": "AgentCaptcha DPP",
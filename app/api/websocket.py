@@ -1,11 +1,18 @@
 """WebSocket handler: runs the verifier over a persistent connection."""
-import json
 import logging
 
+import msgspec
+import orjson
 from fastapi import WebSocket, WebSocketDisconnect
 
+from app.models.challenge import ClientFrame
 from app.protocol.verifier import verify
 
+# Typed decoder for inbound frames: parses and type-checks the three
+# possible client fields in one C pass; a frame with wrong-typed fields
+# fails here instead of deep inside a stage.
+_frame_decoder = msgspec.json.Decoder(ClientFrame)
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,28 +21,52 @@ async def websocket_verify(websocket: WebSocket):
 
     agent_id = websocket.query_params.get("agent_id")
 
-    async def ws_send(data: dict):
-        await websocket.send_text(json.dumps(data))
+    # orjson serializes straight to bytes, so frames go out via send_bytes
+    # with no str→bytes re-encode. Stages may hand over pre-serialized
+    # frames as bytes to skip serialization entirely. Clients still send
+    # text frames; orjson.loads accepts both str and bytes.
+    #
+    # Note on frame coalescing: the DPP protocol is strictly alternating —
+    # every outbound frame is immediately followed by a blocking read of
+    # the client's response — so at most one frame is ever pending at a
+    # read boundary and a cork/uncork send buffer would have nothing to
+    # batch. Revisit if the protocol ever emits back-to-back frames.
+    async def ws_send(data: dict | bytes):
+        if isinstance(data, (bytes, bytearray)):
+            await websocket.send_bytes(data)
+        else:
+            await websocket.send_bytes(orjson.dumps(data))
 
+    # Accept binary or text frames: binary-sending clients skip the UTF-8
+    # str decode entirely and orjson parses the raw payload in place.
     async def ws_recv() -> dict:
-        raw = await websocket.receive_text()
-        return json.loads(raw)
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code") or 1000)
+        raw = message.get("bytes")
+        if raw is None:
+            raw = message["text"]
+        return msgspec.structs.asdict(_frame_decoder.decode(raw))
 
     try:
         result = await verify(ws_send, ws_recv, agent_id=agent_id)
-        logger.info(
-            "Verification %s for agent=%s stages=%s",
-            result.verdict,
-            agent_id,
-            result.stages_passed,
-        )
+        # Gated so a WARNING-level production config skips the LogRecord
+        # allocation entirely — this path runs once per WS session.
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                "Verification %s for agent=%s stages=%s",
+                result.verdict,
+                agent_id,
+                result.stages_passed,
+            )
     except WebSocketDisconnect:
-        logger.info("Client disconnected mid-verification agent=%s", agent_id)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Client disconnected mid-verification agent=%s", agent_id)
     except Exception as exc:
         logger.exception("Unhandled error during verification: %s", exc)
         try:
-            await websocket.send_text(
-                json.dumps({"type": "error", "message": str(exc)})
+            await websocket.send_bytes(
+                orjson.dumps({"type": "error", "message": str(exc)})
             )
         except Exception:
             pass
@@ -1,28 +1,102 @@
 """aiosqlite database setup: sessions and challenge history tables."""
-import json
+import asyncio
+
 import aiosqlite
+import orjson
 from app.config import settings
 
 _db: aiosqlite.Connection | None = None
 
+# Batched write pipeline: writes are enqueued and committed together by a
+# background task, so Stage 2's 10 history rows cost ~1 transaction instead
+# of 10. Each entry is (sql, params, future); the future resolves to the
+# statement's lastrowid once its batch has committed.
+_write_queue: asyncio.Queue | None = None
+_writer_task: asyncio.Task | None = None
+_BATCH_MAX = 64
+_BATCH_WINDOW_S = 0.01
+
 
 async def get_db() -> aiosqlite.Connection:
-    global _db
+    global _db, _write_queue, _writer_task
     if _db is None:
         _db = await aiosqlite.connect(settings.database_url)
         _db.row_factory = aiosqlite.Row
         await _create_tables(_db)
+    if _writer_task is None or _writer_task.done():
+        _write_queue = asyncio.Queue()
+        _writer_task = asyncio.create_task(_writer_loop(_db, _write_queue))
     return _db
 
 
 async def close_db() -> None:
-    global _db
+    global _db, _write_queue, _writer_task
+    if _writer_task is not None:
+        await _write_queue.join()
+        _writer_task.cancel()
+        _writer_task = None
+        _write_queue = None
     if _db is not None:
+        # Fold the WAL back into the main DB file so it doesn't grow unbounded
+        # across restarts.
+        await _db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
         await _db.close()
         _db = None
 
 
+async def _submit_write(sql: str, params: tuple) -> int | None:
+    """Enqueue a write and await its batch commit. Returns the lastrowid."""
+    await get_db()
+    future = asyncio.get_running_loop().create_future()
+    _write_queue.put_nowait((sql, params, future))
+    return await future
+
+
+async def _writer_loop(db: aiosqlite.Connection, queue: asyncio.Queue) -> None:
+    """Drain queued writes and commit them in batches of up to _BATCH_MAX."""
+    while True:
+        batch = [await queue.get()]
+        # Let concurrent writers pile on before paying the commit.
+        await asyncio.sleep(_BATCH_WINDOW_S)
+        while len(batch) < _BATCH_MAX and not queue.empty():
+            batch.append(queue.get_nowait())
+
+        try:
+            rowids = []
+            for sql, params, _ in batch:
+                cursor = await db.execute(sql, params)
+                rowids.append(cursor.lastrowid)
+            await db.commit()
+            for (_, _, future), rowid in zip(batch, rowids):
+                if not future.done():
+                    future.set_result(rowid)
+        except Exception as exc:
+            await db.rollback()
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+        finally:
+            for _ in batch:
+                queue.task_done()
+
+
+# WAL + synchronous=NORMAL removes the per-commit fsync from the verification
+# hot path (~5 commits per session) and lets Stage 4's reader coroutines run
+# concurrently with writers. journal_mode persists in the DB file; the rest
+# are per-connection and must be reapplied on every connect.
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA cache_size=-20000",
+    "PRAGMA busy_timeout=5000",
+)
+
+
 async def _create_tables(db: aiosqlite.Connection) -> None:
+    for pragma in _PRAGMAS:
+        await db.execute(pragma)
     await db.execute("""
         CREATE TABLE IF NOT EXISTS sessions (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -34,9 +108,13 @@ async def _create_tables(db: aiosqlite.Connection) -> None:
             reject_reason TEXT
         )
     """)
+    # Composite index lets the planner satisfy fetch_agent_sessions'
+    # ORDER BY timestamp straight from the index, skipping the temp B-tree
+    # sort. The old single-column index is subsumed and dropped.
+    await db.execute("DROP INDEX IF EXISTS idx_sessions_agent_id")
     await db.execute("""
-        CREATE INDEX IF NOT EXISTS idx_sessions_agent_id
-        ON sessions(agent_id)
+        CREATE INDEX IF NOT EXISTS idx_sessions_agent_ts
+        ON sessions(agent_id, timestamp)
     """)
     await db.execute("""
         CREATE TABLE IF NOT EXISTS challenge_history (
@@ -49,9 +127,70 @@ async def _create_tables(db: aiosqlite.Connection) -> None:
             response_time_s REAL
         )
     """)
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_history_session
+        ON challenge_history(session_id, round_num)
+    """)
+    # Rolling sufficient statistics per agent, maintained on the write
+    # path so Stage 4 reads one row instead of scanning session history.
+    # iv_* accumulate inter-session intervals, s1_* the Stage 1 solve
+    # times, h_* the hour-of-day values.
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS agent_stats (
+            agent_id TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            last_ts REAL NOT NULL,
+            iv_sum REAL NOT NULL DEFAULT 0,
+            iv_sum_sq REAL NOT NULL DEFAULT 0,
+            s1_count INTEGER NOT NULL DEFAULT 0,
+            s1_sum REAL NOT NULL DEFAULT 0,
+            s1_sum_sq REAL NOT NULL DEFAULT 0,
+            h_sum REAL NOT NULL DEFAULT 0,
+            h_sum_sq REAL NOT NULL DEFAULT 0
+        )
+    """)
     await db.commit()
 
 
+# SQL hoisted to module-level constants: sqlite3 keys its per-connection
+# prepared-statement cache on the SQL text, so reusing the exact same
+# string objects guarantees cache hits and skips re-parsing per call.
+_SQL_INSERT_SESSION = """INSERT INTO sessions
+           (agent_id, stage_reached, timestamp, timings, passed, reject_reason)
+           VALUES (?, ?, ?, ?, ?, ?)"""
+
+_SQL_INSERT_HISTORY = """INSERT INTO challenge_history
+           (session_id, round_num, challenge_text, response_text, correct, response_time_s)
+           VALUES (?, ?, ?, ?, ?, ?)"""
+
+_SQL_FETCH_SESSIONS = "SELECT * FROM sessions WHERE agent_id = ? ORDER BY timestamp ASC"
+
+# Welford-style incremental update: the SET expressions all evaluate
+# against the pre-update row, so the new interval derives from the old
+# last_ts in the same statement.
+_SQL_UPSERT_AGENT_STATS = """INSERT INTO agent_stats
+           (agent_id, count, last_ts, iv_sum, iv_sum_sq,
+            s1_count, s1_sum, s1_sum_sq, h_sum, h_sum_sq)
+           VALUES (?, 1, ?, 0, 0, ?, ?, ?, ?, ?)
+           ON CONFLICT(agent_id) DO UPDATE SET
+               count = count + 1,
+               iv_sum = iv_sum + (excluded.last_ts - last_ts),
+               iv_sum_sq = iv_sum_sq
+                   + (excluded.last_ts - last_ts) * (excluded.last_ts - last_ts),
+               last_ts = excluded.last_ts,
+               s1_count = s1_count + excluded.s1_count,
+               s1_sum = s1_sum + excluded.s1_sum,
+               s1_sum_sq = s1_sum_sq + excluded.s1_sum_sq,
+               h_sum = h_sum + excluded.h_sum,
+               h_sum_sq = h_sum_sq + excluded.h_sum_sq"""
+
+_SQL_FETCH_AGENT_STATS = "SELECT * FROM agent_stats WHERE agent_id = ?"
+
+_SQL_FETCH_HISTORY = (
+    "SELECT * FROM challenge_history WHERE session_id = ? ORDER BY round_num ASC"
+)
+
+
 async def insert_session(
     agent_id: str,
     stage_reached: int,
@@ -60,50 +199,56 @@ async def insert_session(
     passed: bool,
     reject_reason: str | None = None,
 ) -> int:
-    db = await get_db()
-    cursor = await db.execute(
-        """INSERT INTO sessions
-           (agent_id, stage_reached, timestamp, timings, passed, reject_reason)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (agent_id, stage_reached, timestamp, json.dumps(timings), int(passed), reject_reason),
+    return await _submit_write(
+        _SQL_INSERT_SESSION,
+        (agent_id, stage_reached, timestamp, orjson.dumps(timings).decode(), int(passed), reject_reason),
     )
-    await db.commit()
-    return cursor.lastrowid
 
 
-async def insert_challenge_history(
-    session_id: int,
-    round_num: int,
-    challenge_text: str,
-    response_text: str,
-    correct: bool,
-    response_time_s: float,
-) -> None:
+async def insert_challenge_history_batch(rows: list[tuple]) -> None:
+    """
+    Insert challenge_history rows in one executemany + commit.
+    Each row: (session_id, round_num, challenge_text, response_text,
+    correct, response_time_s).
+    """
+    if not rows:
+        return
     db = await get_db()
-    await db.execute(
-        """INSERT INTO challenge_history
-           (session_id, round_num, challenge_text, response_text, correct, response_time_s)
-           VALUES (?, ?, ?, ?, ?, ?)""",
-        (session_id, round_num, challenge_text, response_text, int(correct), response_time_s),
-    )
+    await db.executemany(_SQL_INSERT_HISTORY, rows)
     await db.commit()
 
 
 async def fetch_agent_sessions(agent_id: str) -> list[dict]:
     db = await get_db()
-    cursor = await db.execute(
-        "SELECT * FROM sessions WHERE agent_id = ? ORDER BY timestamp ASC",
-        (agent_id,),
+    cursor = await db.execute(_SQL_FETCH_SESSIONS, (agent_id,))
+    return [dict(r) async for r in cursor]
+
+
+async def update_agent_stats(
+    agent_id: str, timestamp: float, stage1_s: float | None
+) -> None:
+    """Fold one session into the agent's rolling aggregates."""
+    hour = (timestamp % 86400.0) / 3600.0
+    s1 = stage1_s if stage1_s is not None else 0.0
+    await _submit_write(
+        _SQL_UPSERT_AGENT_STATS,
+        (
+            agent_id, timestamp,
+            int(stage1_s is not None), s1, s1 * s1,
+            hour, hour * hour,
+        ),
     )
-    rows = await cursor.fetchall()
-    return [dict(r) for r in rows]
+
+
+async def fetch_agent_stats(agent_id: str) -> dict | None:
+    """O(1) read of the rolling aggregates maintained by update_agent_stats."""
+    db = await get_db()
+    cursor = await db.execute(_SQL_FETCH_AGENT_STATS, (agent_id,))
+    row = await cursor.fetchone()
+    return dict(row) if row is not None else None
 
 
 async def fetch_challenge_history(session_id: int) -> list[dict]:
     db = await get_db()
-    cursor = await db.execute(
-        "SELECT * FROM challenge_history WHERE session_id = ? ORDER BY round_num ASC",
-        (session_id,),
-    )
-    rows = await cursor.fetchall()
-    return [dict(r) for r in rows]
+    cursor = await db.execute(_SQL_FETCH_HISTORY, (session_id,))
+    return [dict(r) async for r in cursor]
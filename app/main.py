@@ -1,5 +1,6 @@
 """FastAPI application with lifespan, rate limiting, WebSocket, and REST routes."""
 import logging
+import os
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, WebSocket
@@ -8,9 +9,11 @@ from app.api.routes import router
 from app.api.websocket import websocket_verify
 from app.database import close_db, get_db
 from app.middleware.rate_limit import RateLimitMiddleware
+from app.protocol.verifier import flush_persist_tasks
 
+# LOG_LEVEL=WARNING in production avoids per-session log cost entirely.
 logging.basicConfig(
-    level=logging.INFO,
+    level=os.getenv("LOG_LEVEL", "INFO"),
     format="%(asctime)s %(levelname)s %(name)s: %(message)s",
 )
 logger = logging.getLogger(__name__)
@@ -27,6 +30,7 @@ async def lifespan(app: FastAPI):
         )
     yield
     logger.info("AgentCaptcha shutting down — closing database")
+    await flush_persist_tasks()
     await close_db()
 
 
@@ -1,24 +1,40 @@
-"""Sliding-window rate limiter middleware for FastAPI."""
+"""Token-bucket rate limiter middleware for FastAPI."""
+import math
 import time
-from collections import defaultdict, deque
 
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.config import settings
 
+# Fixed-shape 429 envelope: only retry_after_s varies, so splice it into
+# a pre-serialized template instead of building a dict + JSON per reject.
+_RATE_LIMITED_TEMPLATE = (
+    b'{"ok":false,"code":"agent.rate_limited",'
+    b'"message":"Rate limit exceeded","retry_after_s":%d}'
+)
+
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """
-    Per-IP sliding-window rate limiter.
-    Allows RATE_LIMIT_REQUESTS requests per RATE_LIMIT_WINDOW_S seconds.
+    Per-IP token-bucket rate limiter.
+    Allows RATE_LIMIT_REQUESTS requests per RATE_LIMIT_WINDOW_S seconds,
+    with bursts up to the full bucket. O(1) per request — buckets refill
+    lazily from the elapsed time, so no timestamp list is kept or scanned.
     WebSocket upgrade requests count toward the limit.
     """
 
+    # Bound memory under scan/attack traffic: hard cap on tracked IPs
+    # (least-recently-seen evicted first) plus a periodic sweep of buckets
+    # idle long enough to have fully refilled anyway.
+    _MAX_BUCKETS = 10_000
+
     def __init__(self, app):
         super().__init__(app)
-        # ip → deque of request timestamps
-        self._windows: dict[str, deque] = defaultdict(deque)
+        # ip → (tokens, last_refill) — refilled lazily on each request,
+        # kept in least-recently-seen → most-recently-seen insertion order
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._last_sweep = time.monotonic()
 
     def _get_ip(self, request: Request) -> str:
         forwarded = request.headers.get("X-Forwarded-For")
@@ -26,25 +42,60 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             return forwarded.split(",")[0].strip()
         return request.client.host if request.client else "unknown"
 
-    async def dispatch(self, request: Request, call_next) -> Response:
-        ip = self._get_ip(request)
-        now = time.monotonic()
+    def _allow(self, ip: str, now: float) -> bool:
+        """Take one token from ip's bucket; returns False when empty."""
+        limit = settings.rate_limit_requests
         window = settings.rate_limit_window_s
+
+        bucket = self._buckets.pop(ip, None)
+        tokens, last = bucket if bucket is not None else (float(limit), now)
+        tokens = min(float(limit), tokens + (now - last) * limit / window)
+
+        allowed = tokens >= 1.0
+        # Reinsert at the most-recently-seen end; evict the oldest IP
+        # once over the cap.
+        self._buckets[ip] = (tokens - 1.0 if allowed else tokens, now)
+        if len(self._buckets) > self._MAX_BUCKETS:
+            self._buckets.pop(next(iter(self._buckets)))
+        return allowed
+
+    def _sweep(self, now: float) -> None:
+        """Drop buckets idle for a full window — they'd be full on return."""
+        window = settings.rate_limit_window_s
+        self._buckets = {
+            ip: bucket for ip, bucket in self._buckets.items()
+            if now - bucket[1] < window
+        }
+
+    def _retry_after_s(self, ip: str, now: float) -> int:
+        """Seconds until ip's bucket accrues one full token."""
         limit = settings.rate_limit_requests
+        window = settings.rate_limit_window_s
+        tokens, _ = self._buckets.get(ip, (0.0, now))
+        return max(1, math.ceil((1.0 - tokens) * window / limit))
 
-        dq = self._windows[ip]
+    async def dispatch(self, request: Request, call_next) -> Response:
+        ip = self._get_ip(request)
+        now = time.monotonic()
 
-        # Evict timestamps outside the window
-        while dq and now - dq[0] > window:
-            dq.popleft()
+        if now - self._last_sweep >= settings.rate_limit_window_s:
+            self._last_sweep = now
+            self._sweep(now)
 
-        if len(dq) >= limit:
+        if not self._allow(ip, now):
+            # Tell well-behaved clients exactly how long to back off, so
+            # retries don't arrive before a token is available.
+            retry_after = self._retry_after_s(ip, now)
             return Response(
-                content='{"detail":"rate limit exceeded"}',
+                content=_RATE_LIMITED_TEMPLATE % retry_after,
                 status_code=429,
                 media_type="application/json",
-                headers={"Retry-After": str(window)},
+                headers={
+                    "Retry-After": str(retry_after),
+                    "X-RateLimit-Limit": str(settings.rate_limit_requests),
+                    "X-RateLimit-Remaining": "0",
+                    "X-RateLimit-Reset": str(retry_after),
+                },
             )
 
-        dq.append(now)
         return await call_next(request)
@@ -1,7 +1,9 @@
-"""Challenge, Response, and Stage dataclasses."""
+"""Challenge, Response, and Stage dataclasses plus wire-schema structs."""
 from dataclasses import dataclass
 from enum import IntEnum
 
+import msgspec
+
 
 class Stage(IntEnum):
     POW = 1
@@ -25,3 +27,26 @@ class ChallengeResponse:
     answer: str
     elapsed_s: float
     correct: bool = False
+
+
+# msgspec wire schemas: the C decoder parses and type-validates inbound
+# JSON in one pass, replacing loads + manual .get/isinstance chains.
+
+class GeneratedChallenge(msgspec.Struct):
+    """Shape of a Claude-generated Stage 2 challenge."""
+    prompt: str
+    options: list[str]
+    correct_option: str
+    rationale: str = ""
+
+
+class ValidationVerdict(msgspec.Struct):
+    """Shape of a Claude validation response."""
+    correct: bool = False
+
+
+class ClientFrame(msgspec.Struct):
+    """Inbound WS frame — one field is populated per protocol step."""
+    solution: str = ""
+    answer: str = ""
+    env: dict = {}
@@ -16,6 +16,10 @@ class Session:
     timings: dict = field(default_factory=dict)
     challenge_responses: list = field(default_factory=list)
     env_data: dict = field(default_factory=dict)
+    # Stage 2 rounds buffered for persistence; the verifier prepends the
+    # session_id once the session row exists. Each entry:
+    # (round_num, challenge_text, response_text, correct, response_time_s)
+    pending_history: list = field(default_factory=list)
 
 
 @dataclass
@@ -3,22 +3,50 @@ import asyncio
 import hashlib
 import os
 import time
+from functools import lru_cache
 
 from app.config import settings
 from app.models.session import Session, VerificationResult
 
+# Fixed-shape frame: only the nonce varies per connection, so splice it
+# into a pre-serialized template instead of building a dict + JSON each time.
+_CHALLENGE_TEMPLATE = (
+    b'{"stage":1,"type":"pow_challenge","nonce":"%b","difficulty":%d,"timeout_ms":%d}'
+)
+
 
 def _make_nonce() -> bytes:
     return os.urandom(16)
 
 
-def _target_prefix(difficulty: int) -> str:
-    return "0" * difficulty
+def make_verifier(difficulty: int):
+    """
+    Return a verifier specialized for one difficulty: the zero-byte target
+    and odd-nibble flag are baked into the closure, so per-call work is
+    just the hash and a bytes compare — no config reads, no hex encoding.
+    """
+    prefix = b"\x00" * (difficulty // 2)
+    prefix_len = len(prefix)
+    odd_nibble = bool(difficulty & 1)
+    sha256 = hashlib.sha256
+
+    def verify(nonce: bytes, solution: str) -> bool:
+        digest = sha256(nonce + solution.encode()).digest()
+        if digest[:prefix_len] != prefix:
+            return False
+        return not odd_nibble or digest[prefix_len] >> 4 == 0
+
+    return verify
+
+
+_make_verifier_cached = lru_cache(maxsize=8)(make_verifier)
+
+# Difficulty is fixed for the process lifetime — bind the hot-path verifier once.
+_verify = make_verifier(settings.pow_difficulty)
 
 
 def verify_solution(nonce: bytes, solution: str, difficulty: int) -> bool:
-    digest = hashlib.sha256(nonce + solution.encode()).hexdigest()
-    return digest.startswith(_target_prefix(difficulty))
+    return _make_verifier_cached(difficulty)(nonce, solution)
 
 
 async def run(session: Session, ws_send, ws_recv) -> VerificationResult | None:
@@ -28,16 +56,15 @@ async def run(session: Session, ws_send, ws_recv) -> VerificationResult | None:
     """
     nonce = _make_nonce()
     session.nonce = nonce
+    timeout_ms = settings.pow_timeout_ms
 
-    await ws_send({
-        "stage": 1,
-        "type": "pow_challenge",
-        "nonce": nonce.hex(),
-        "difficulty": settings.pow_difficulty,
-        "timeout_ms": settings.pow_timeout_ms,
-    })
+    await ws_send(_CHALLENGE_TEMPLATE % (
+        nonce.hex().encode(),
+        settings.pow_difficulty,
+        timeout_ms,
+    ))
 
-    deadline = settings.pow_timeout_ms / 1000.0
+    deadline = timeout_ms / 1000.0
     t0 = time.perf_counter()
 
     try:
@@ -51,7 +78,7 @@ async def run(session: Session, ws_send, ws_recv) -> VerificationResult | None:
     session.timings["stage1"] = elapsed
 
     solution = msg.get("solution", "")
-    if not verify_solution(nonce, solution, settings.pow_difficulty):
+    if not _verify(nonce, solution):
         return VerificationResult.reject("stage1_invalid_solution")
 
     session.stage_reached = 1
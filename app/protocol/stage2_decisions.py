@@ -1,122 +1,168 @@
 """Stage 2: 10-round semantic decision challenges via Claude API."""
 import asyncio
 import hashlib
-import logging
 import time
 
+import numpy as np
+import orjson
+
 from app.config import settings
 from app.models.challenge import ChallengeResponse
 from app.models.session import Session, VerificationResult
+from app.services.backpressure import limiter
 from app.services.challenge_gen import generate_challenge, validate_response
-
-logger = logging.getLogger(__name__)
+from app.services.stats import mean_and_cv
 
 # CV threshold: reject if timing is too erratic (human-like inconsistency).
 # Set at 0.8 to accommodate agents calling external APIs with moderate network jitter.
 _CV_REJECT_THRESHOLD = 0.8
 
+# Fixed-shape challenge frame: the envelope is pre-serialized and the
+# round-varying fields (already JSON-encoded where needed) are spliced in,
+# avoiding a fresh dict + full serialization per round.
+_CHALLENGE_TEMPLATE = (
+    b'{"stage":2,"type":"decision_challenge","round":%d,"total_rounds":%d,'
+    b'"prompt":%b,"options":%b,"prev_answer_hash":"%b"}'
+)
+_MOCK_CHALLENGE_TEMPLATE = (
+    b'{"stage":2,"type":"decision_challenge","round":%d,"total_rounds":%d,'
+    b'"prompt":%b,"options":%b,"prev_answer_hash":"%b","mock_correct":%b,'
+    b'"mock_correct_idx":%d}'
+)
+
 
 async def run(
     session: Session,
     ws_send,
     ws_recv,
-    session_id: int | None = None,
 ) -> VerificationResult | None:
     """
     Run DECISION_ROUNDS rounds of semantic challenges.
-    Persists each round to challenge_history if session_id is provided.
+    Buffers each round on session.pending_history; the verifier persists
+    them once the session row exists.
     Returns None on success, VerificationResult.reject on failure.
     """
-    from app.database import insert_challenge_history
+    # Snapshot hot-loop settings once: locals are LOAD_FAST, pydantic
+    # attribute access is not.
+    rounds = settings.decision_rounds
+    timeout_s = settings.decision_timeout_s
+    mock = settings.use_mock_challenges
 
     responses: list[ChallengeResponse] = []
     prev_answer_hash = ""
     context = {"agent_id": session.agent_id, "history": []}
 
-    for round_num in range(1, settings.decision_rounds + 1):
-        challenge = await generate_challenge(context, round_num, prev_answer_hash)
-
-        payload: dict = {
-            "stage": 2,
-            "type": "decision_challenge",
-            "round": round_num,
-            "total_rounds": settings.decision_rounds,
-            "prompt": challenge["prompt"],
-            "options": challenge.get("options", []),
-            "prev_answer_hash": prev_answer_hash,
-        }
-        # In mock mode (no API key), include the correct option so demo clients
-        # can respond correctly without a Claude key.
-        if settings.use_mock_challenges:
-            payload["mock_correct"] = challenge.get("correct_option", "A")
-        await ws_send(payload)
-
-        t0 = time.perf_counter()
-        try:
-            msg = await asyncio.wait_for(
-                ws_recv(), timeout=settings.decision_timeout_s
-            )
-        except asyncio.TimeoutError:
+    # Challenge N+1 is generated concurrently with validating answer N —
+    # its prev_answer_hash only needs the answer, not the verdict — so in
+    # Claude mode the two API round-trips per round overlap.
+    challenge_task = asyncio.create_task(
+        generate_challenge(context, 1, prev_answer_hash)
+    )
+    try:
+        for round_num in range(1, rounds + 1):
+            challenge = await challenge_task
+
+            # In mock mode (no API key), include the correct option so demo
+            # clients can respond correctly without a Claude key.
+            if mock:
+                correct = challenge.get("correct_option", "A").strip().upper()[:1] or "A"
+                frame = _MOCK_CHALLENGE_TEMPLATE % (
+                    round_num,
+                    rounds,
+                    orjson.dumps(challenge["prompt"]),
+                    orjson.dumps(challenge.get("options", [])),
+                    prev_answer_hash.encode(),
+                    orjson.dumps(challenge.get("correct_option", "A")),
+                    # Correct option's index (A→0 …) so clients can pick it
+                    # in O(1) instead of scanning options for the letter.
+                    ord(correct) - 65,
+                )
+            else:
+                frame = _CHALLENGE_TEMPLATE % (
+                    round_num,
+                    rounds,
+                    orjson.dumps(challenge["prompt"]),
+                    orjson.dumps(challenge.get("options", [])),
+                    prev_answer_hash.encode(),
+                )
+            # Acquire the AIMD slot before the challenge goes out: any
+            # wait for capacity happens here, not between send and recv,
+            # so t0 → reply measures pure client response time. Queueing
+            # under contention must not inflate the stage2_cv biometric.
+            async with limiter:
+                await ws_send(frame)
+
+                t0 = time.perf_counter()
+                try:
+                    msg = await asyncio.wait_for(ws_recv(), timeout=timeout_s)
+                except asyncio.TimeoutError:
+                    elapsed = time.perf_counter() - t0
+                    session.timings["stage2"] = elapsed
+                    limiter.record_timeout()
+                    return VerificationResult.reject(
+                        f"stage2_timeout_round{round_num}"
+                    )
+            limiter.record_success()
+
             elapsed = time.perf_counter() - t0
-            session.timings["stage2"] = elapsed
-            return VerificationResult.reject(f"stage2_timeout_round{round_num}")
-
-        elapsed = time.perf_counter() - t0
-        answer = msg.get("answer", "")
-
-        correct = await validate_response(challenge, answer, context)
-        resp = ChallengeResponse(
-            round_num=round_num,
-            answer=answer,
-            elapsed_s=elapsed,
-            correct=correct,
-        )
-        responses.append(resp)
-        session.challenge_responses.append(resp)
-
-        # Persist to DB
-        if session_id is not None:
-            try:
-                await insert_challenge_history(
-                    session_id=session_id,
-                    round_num=round_num,
-                    challenge_text=challenge["prompt"],
-                    response_text=answer,
-                    correct=correct,
-                    response_time_s=elapsed,
+            answer = msg.get("answer", "")
+
+            # Start generating the next challenge before validating this
+            # answer: the hash chain needs only the raw answer, and the
+            # history entry's verdict is filled in post-validation (only
+            # its length feeds the generation prompt).
+            prev_answer_hash = hashlib.sha256(answer.encode()).hexdigest()[:16]
+            entry = {
+                "round": round_num,
+                "prompt": challenge["prompt"],
+                "answer": answer,
+                "correct": None,
+            }
+            context["history"].append(entry)
+            if round_num < rounds:
+                challenge_task = asyncio.create_task(
+                    generate_challenge(context, round_num + 1, prev_answer_hash)
                 )
-            except Exception as exc:
-                logger.warning("Failed to persist challenge_history round %d: %s", round_num, exc)
-
-        prev_answer_hash = hashlib.sha256(answer.encode()).hexdigest()[:16]
-        context["history"].append({
-            "round": round_num,
-            "prompt": challenge["prompt"],
-            "answer": answer,
-            "correct": correct,
-        })
-
-    # Timing variance check
-    timings = [r.elapsed_s for r in responses]
-    mean = sum(timings) / len(timings)
-    if mean > 0:
-        std = (sum((t - mean) ** 2 for t in timings) / len(timings)) ** 0.5
-        cv = std / mean
-    else:
-        cv = 0.0
+
+            correct = await validate_response(challenge, answer, context)
+            entry["correct"] = correct
+            resp = ChallengeResponse(
+                round_num=round_num,
+                answer=answer,
+                elapsed_s=elapsed,
+                correct=correct,
+            )
+            responses.append(resp)
+            session.challenge_responses.append(resp)
+
+            # Buffer for persistence — the verifier flushes these in one batch
+            session.pending_history.append((
+                round_num, challenge["prompt"], answer, int(correct), elapsed,
+            ))
+    finally:
+        # Timeout/disconnect paths may leave a speculative generation pending
+        if not challenge_task.done():
+            challenge_task.cancel()
+
+    # Timing variance check — one vectorized pass over the round timings
+    timings = np.fromiter(
+        (r.elapsed_s for r in responses), dtype=np.float64, count=len(responses)
+    )
+    mean, cv = mean_and_cv(timings)
 
     session.timings["stage2_cv"] = cv
-    session.timings["stage2"] = sum(timings)
+    session.timings["stage2"] = float(timings.sum())
     session.timings["stage2_mean_s"] = mean
 
     if cv > _CV_REJECT_THRESHOLD:
         return VerificationResult.reject(f"stage2_timing_variance_cv={cv:.3f}")
 
     correct_count = sum(1 for r in responses if r.correct)
-    if correct_count < settings.decision_rounds * 0.7:
+    if correct_count < rounds * 0.7:
         return VerificationResult.reject(
-            f"stage2_low_accuracy_{correct_count}/{settings.decision_rounds}"
+            f"stage2_low_accuracy_{correct_count}/{rounds}"
         )
 
     session.stage_reached = 2
     return None
+
@@ -1,8 +1,12 @@
 """Stage 3: Environment attestation — process tree, TTY, display checks."""
 import asyncio
+import sys
 import time
 
+import orjson
+
 from app.models.session import Session, VerificationResult
+from app.services.backpressure import limiter
 
 # Required keys and their agent-like expected values
 _CHECKS = {
@@ -13,47 +17,39 @@ _CHECKS = {
     "parent_process": None,    # Checked separately (not bash/zsh/sh)
 }
 
-_HUMAN_SHELLS = {"bash", "zsh", "sh", "fish", "cmd", "powershell", "pwsh"}
+# Interned frozenset: the handful of common shell names are shared string
+# objects, so the membership test short-circuits on identity.
+_HUMAN_SHELLS = frozenset(map(sys.intern, (
+    "bash", "zsh", "sh", "fish", "cmd", "powershell", "pwsh",
+)))
+
+# (key, default, predicate) table — one loop replaces five sequential
+# if/else blocks. Defaults are chosen so a missing key fails its check.
+_PREDICATES = (
+    ("has_tty", None, lambda v: v is False),
+    ("display_set", True, lambda v: not v),
+    ("uptime_seconds", -1, lambda v: isinstance(v, (int, float)) and v >= 0),
+    ("open_connections", -1, lambda v: isinstance(v, int) and v >= 0),
+    ("parent_process", "", lambda v: bool(v) and v.lower() not in _HUMAN_SHELLS),
+)
+
+# The env_request frame never varies — serialize it once at import.
+_ENV_REQUEST_FRAME = orjson.dumps({
+    "stage": 3,
+    "type": "env_request",
+    "required_fields": list(_CHECKS.keys()),
+})
 
 
 def _evaluate(env: dict) -> tuple[int, list[str]]:
     """Return (checks_passed, failed_check_names)."""
     passed = 0
     failed = []
-
-    # Check 1: no TTY
-    if env.get("has_tty") is False:
-        passed += 1
-    else:
-        failed.append("has_tty")
-
-    # Check 2: no DISPLAY
-    if not env.get("display_set", True):
-        passed += 1
-    else:
-        failed.append("display_set")
-
-    # Check 3: uptime > 0
-    uptime = env.get("uptime_seconds", -1)
-    if isinstance(uptime, (int, float)) and uptime >= 0:
-        passed += 1
-    else:
-        failed.append("uptime_seconds")
-
-    # Check 4: open_connections is a non-negative integer
-    conns = env.get("open_connections", -1)
-    if isinstance(conns, int) and conns >= 0:
-        passed += 1
-    else:
-        failed.append("open_connections")
-
-    # Check 5: parent process is not an interactive shell
-    parent = env.get("parent_process", "").lower()
-    if parent and parent not in _HUMAN_SHELLS:
-        passed += 1
-    else:
-        failed.append("parent_process")
-
+    for key, default, predicate in _PREDICATES:
+        if predicate(env.get(key, default)):
+            passed += 1
+        else:
+            failed.append(key)
     return passed, failed
 
 
@@ -62,17 +58,16 @@ async def run(session: Session, ws_send, ws_recv) -> VerificationResult | None:
     Request env dict from client, verify 4/5 conditions pass.
     Returns None on success, VerificationResult.reject on failure.
     """
-    await ws_send({
-        "stage": 3,
-        "type": "env_request",
-        "required_fields": list(_CHECKS.keys()),
-    })
+    await ws_send(_ENV_REQUEST_FRAME)
 
     t0 = time.perf_counter()
-    try:
-        msg = await asyncio.wait_for(ws_recv(), timeout=5.0)
-    except asyncio.TimeoutError:
-        return VerificationResult.reject("stage3_timeout")
+    async with limiter:
+        try:
+            msg = await asyncio.wait_for(ws_recv(), timeout=5.0)
+        except asyncio.TimeoutError:
+            limiter.record_timeout()
+            return VerificationResult.reject("stage3_timeout")
+    limiter.record_success()
 
     elapsed = time.perf_counter() - t0
     session.timings["stage3"] = elapsed
@@ -1,28 +1,37 @@
 """Stage 4: Cross-session statistical consistency analysis."""
+import asyncio
 import time
 
-from app.database import fetch_agent_sessions
+from app.database import fetch_agent_stats
 from app.models.session import Session, VerificationResult
 from app.services.consistency import analyze_sessions
 
 _MIN_SESSIONS = 5
 
 
-async def run(session: Session) -> VerificationResult | None:
+async def run(
+    session: Session,
+    stats_task: "asyncio.Task | None" = None,
+) -> VerificationResult | None:
     """
-    Fetch historical sessions for agent_id, run statistical analysis.
+    Run statistical analysis over the agent's rolling aggregates.
+    The verifier may pass a stats_task started speculatively after
+    Stage 1, so the DB read overlaps Stages 2-3; otherwise fetch here.
     Skipped if fewer than MIN_SESSIONS exist.
     Returns None on pass/skip, VerificationResult.reject on anomaly.
     """
     t0 = time.perf_counter()
-    history = await fetch_agent_sessions(session.agent_id)
+    if stats_task is not None:
+        stats_row = await stats_task
+    else:
+        stats_row = await fetch_agent_stats(session.agent_id)
     session.timings["stage4_fetch_s"] = time.perf_counter() - t0
 
-    if len(history) < _MIN_SESSIONS:
+    if stats_row is None or stats_row["count"] < _MIN_SESSIONS:
         session.stage_reached = 4
         return None
 
-    result = analyze_sessions(history)
+    result = analyze_sessions(stats_row)
     session.timings["stage4"] = result
 
     if not result["consistent"]:
@@ -1,12 +1,52 @@
 """Orchestrates all 4 verification stages and persists results."""
+import asyncio
+import logging
 import time
 import uuid
 
-from app.database import insert_session
+from app.database import (
+    fetch_agent_stats,
+    insert_challenge_history_batch,
+    insert_session,
+    update_agent_stats,
+)
 from app.models.session import Session, VerificationResult, Verdict
 from app.protocol import stage1_pow, stage2_decisions, stage3_environment, stage4_consistency
 from app.services.token import create_token
 
+logger = logging.getLogger(__name__)
+
+# Persistence runs off the hot path: verify() schedules _persist as a
+# task and sends the result frame without waiting for the DB. Strong
+# references keep the tasks alive until done (close_db drains the write
+# queue at shutdown, so scheduled rows still land).
+_persist_tasks: set[asyncio.Task] = set()
+
+
+def _persist_in_background(
+    session: Session,
+    timestamp: float,
+    passed: bool,
+    reject_reason: str | None,
+) -> None:
+    task = asyncio.create_task(
+        _persist(session, timestamp, passed=passed, reject_reason=reject_reason)
+    )
+    _persist_tasks.add(task)
+    task.add_done_callback(_persist_done)
+
+
+def _persist_done(task: asyncio.Task) -> None:
+    _persist_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning("Session persistence failed: %s", task.exception())
+
+
+async def flush_persist_tasks() -> None:
+    """Wait for in-flight session writes; called from lifespan shutdown."""
+    while _persist_tasks:
+        await asyncio.gather(*_persist_tasks, return_exceptions=True)
+
 
 async def verify(ws_send, ws_recv, agent_id: str | None = None) -> VerificationResult:
     """
@@ -18,20 +58,13 @@ async def verify(ws_send, ws_recv, agent_id: str | None = None) -> VerificationR
     timestamp = time.time()
     stages_passed: list[int] = []
 
-    # Pre-create a session row so Stage 2 can write challenge_history against it.
-    # We'll update it at the end — for now record stage 0, not passed.
-    session_id = await insert_session(
-        agent_id=agent_id,
-        stage_reached=0,
-        timestamp=timestamp,
-        timings={},
-        passed=False,
-        reject_reason="in_progress",
-    )
+    stats_task: asyncio.Task | None = None
 
     async def _reject(result: VerificationResult) -> VerificationResult:
+        if stats_task is not None and not stats_task.done():
+            stats_task.cancel()
         await ws_send({"type": "result", "verdict": "REJECT", "reason": result.reason})
-        await _update_session(session_id, session, passed=False, reject_reason=result.reason)
+        _persist_in_background(session, timestamp, passed=False, reject_reason=result.reason)
         return result
 
     # Stage 1 — Proof of Work
@@ -40,8 +73,12 @@ async def verify(ws_send, ws_recv, agent_id: str | None = None) -> VerificationR
         return await _reject(result)
     stages_passed.append(1)
 
-    # Stage 2 — Semantic decision challenges (passes session_id for history writes)
-    result = await stage2_decisions.run(session, ws_send, ws_recv, session_id=session_id)
+    # Kick off Stage 4's aggregate read now so the DB round-trip overlaps
+    # the client-bound Stages 2 and 3; Stage 4 just awaits the result.
+    stats_task = asyncio.create_task(fetch_agent_stats(agent_id))
+
+    # Stage 2 — Semantic decision challenges (rounds buffered on session)
+    result = await stage2_decisions.run(session, ws_send, ws_recv)
     if result is not None:
         return await _reject(result)
     stages_passed.append(2)
@@ -53,14 +90,14 @@ async def verify(ws_send, ws_recv, agent_id: str | None = None) -> VerificationR
     stages_passed.append(3)
 
     # Stage 4 — Cross-session consistency
-    result = await stage4_consistency.run(session)
+    result = await stage4_consistency.run(session, stats_task=stats_task)
     if result is not None:
         return await _reject(result)
     stages_passed.append(4)
 
     token = create_token(agent_id=agent_id, stages_passed=stages_passed)
 
-    await _update_session(session_id, session, passed=True, reject_reason=None)
+    _persist_in_background(session, timestamp, passed=True, reject_reason=None)
 
     await ws_send({
         "type": "result",
@@ -72,26 +109,34 @@ async def verify(ws_send, ws_recv, agent_id: str | None = None) -> VerificationR
     return VerificationResult.accept(token=token, stages_passed=stages_passed)
 
 
-async def _update_session(
-    session_id: int,
+async def _persist(
     session: Session,
+    timestamp: float,
     passed: bool,
     reject_reason: str | None,
 ) -> None:
-    """Overwrite the pre-created session row with final state."""
-    import json
-    from app.database import get_db
-    db = await get_db()
-    await db.execute(
-        """UPDATE sessions
-           SET stage_reached=?, timings=?, passed=?, reject_reason=?
-           WHERE id=?""",
-        (
-            session.stage_reached,
-            json.dumps(session.timings),
-            int(passed),
-            reject_reason,
-            session_id,
-        ),
+    """
+    Write the session row once, with final state, then flush any Stage 2
+    rounds buffered on the session. History loss is non-fatal.
+    """
+    session_id = await insert_session(
+        agent_id=session.agent_id,
+        stage_reached=session.stage_reached,
+        timestamp=timestamp,
+        timings=session.timings,
+        passed=passed,
+        reject_reason=reject_reason,
+    )
+    await update_agent_stats(
+        session.agent_id, timestamp, session.timings.get("stage1")
     )
-    await db.commit()
+    if session.pending_history:
+        try:
+            await insert_challenge_history_batch(
+                [(session_id, *row) for row in session.pending_history]
+            )
+        except Exception as exc:
+            logger.warning(
+                "Failed to persist challenge_history (%d rows): %s",
+                len(session.pending_history), exc,
+            )
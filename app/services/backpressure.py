@@ -0,0 +1,68 @@
+"""AIMD concurrency control for stages that block on client responses."""
+import asyncio
+
+
+class AIMDLimiter:
+    """
+    Additive-increase / multiplicative-decrease limiter.
+
+    Stages acquire a slot (``async with limiter:``) before blocking on a
+    client response. Responses within budget grow the allowance additively;
+    timeouts halve it. Under a slow or hostile client population this
+    converges concurrency to what the latency budget allows instead of
+    letting every connection pin a worker slot for the full fixed timeout.
+    """
+
+    def __init__(
+        self,
+        initial: float = 8.0,
+        minimum: float = 1.0,
+        maximum: float = 64.0,
+        increase: float = 0.5,
+        decrease: float = 0.5,
+    ):
+        self._capacity = initial
+        self._minimum = minimum
+        self._maximum = maximum
+        self._increase = increase
+        self._decrease = decrease
+        self._active = 0
+        self._cond: asyncio.Condition | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def capacity(self) -> float:
+        return self._capacity
+
+    def _get_cond(self) -> asyncio.Condition:
+        # asyncio primitives bind to the loop they first wait on; recreate
+        # the condition (keeping the learned capacity) if the loop changed.
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._cond = asyncio.Condition()
+            self._active = 0
+        return self._cond
+
+    async def __aenter__(self) -> "AIMDLimiter":
+        cond = self._get_cond()
+        async with cond:
+            await cond.wait_for(lambda: self._active < int(self._capacity))
+            self._active += 1
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        cond = self._get_cond()
+        async with cond:
+            self._active -= 1
+            cond.notify_all()
+
+    def record_success(self) -> None:
+        self._capacity = min(self._maximum, self._capacity + self._increase)
+
+    def record_timeout(self) -> None:
+        self._capacity = max(self._minimum, self._capacity * self._decrease)
+
+
+# Shared limiter for the client-response waits in Stages 2 and 3.
+limiter = AIMDLimiter()
@@ -1,13 +1,26 @@
 """Challenge generation and validation — Claude API with static fallback."""
-import json
 import logging
 import random
 import re
 
+import msgspec
+import orjson
+
 from app.config import settings
+from app.models.challenge import GeneratedChallenge, ValidationVerdict
+
+# Typed decoders: parse + schema-validate Claude's JSON in a single C pass;
+# malformed output falls through to the static fallback like any API error.
+_challenge_decoder = msgspec.json.Decoder(GeneratedChallenge)
+_verdict_decoder = msgspec.json.Decoder(ValidationVerdict)
 
 logger = logging.getLogger(__name__)
 
+# Compiled once; _strip_fences guards each with a cheap startswith/endswith
+# so clean responses (the common case) never enter the regex engine.
+_FENCE_OPEN = re.compile(r"^```(?:json)?\s*")
+_FENCE_CLOSE = re.compile(r"\s*```$")
+
 # ---------------------------------------------------------------------------
 # Static challenge bank (used when ANTHROPIC_API_KEY is not set)
 # ---------------------------------------------------------------------------
@@ -98,8 +111,23 @@ _claude_client = None
 def _get_claude_client():
     global _claude_client
     if _claude_client is None:
-        from anthropic import AsyncAnthropic
-        _claude_client = AsyncAnthropic(api_key=settings.anthropic_api_key)
+        import httpx
+        from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+        # One shared client per worker: HTTP/2 multiplexes the concurrent
+        # generate/validate calls over a single TLS connection, and long
+        # keep-alive avoids a fresh handshake between rounds.
+        _claude_client = AsyncAnthropic(
+            api_key=settings.anthropic_api_key,
+            http_client=DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=100,
+                    keepalive_expiry=300.0,
+                ),
+                timeout=httpx.Timeout(30.0),
+            ),
+        )
     return _claude_client
 
 
@@ -110,6 +138,15 @@ _SCENARIOS = [
     "capacity_planning",
 ]
 
+# Pre-augmented challenge table: scenario is paired with each entry once
+# at import and round_num is pre-shaped as a placeholder, so the mock hot
+# path is a flat dict copy plus one key overwrite instead of building the
+# augmented dict per round.
+_STATIC_TABLE = tuple(
+    {**ch, "round_num": 0, "scenario": _SCENARIOS[i % len(_SCENARIOS)]}
+    for i, ch in enumerate(_STATIC_CHALLENGES)
+)
+
 _GEN_SYSTEM = """\
 You are generating decision challenges for the Decision-Proof Protocol (DPP).
 Each challenge tests whether a respondent is an autonomous AI agent capable of
@@ -133,6 +170,16 @@ correct option.
 Respond ONLY with valid JSON: {"correct": true} or {"correct": false}
 """
 
+# Block form of the system prompts with prompt caching: Anthropic keeps
+# the constant prefix server-side, so repeat calls skip re-tokenizing
+# (and re-billing) the instructions.
+_GEN_SYSTEM_BLOCKS = [
+    {"type": "text", "text": _GEN_SYSTEM, "cache_control": {"type": "ephemeral"}},
+]
+_VAL_SYSTEM_BLOCKS = [
+    {"type": "text", "text": _VAL_SYSTEM, "cache_control": {"type": "ephemeral"}},
+]
+
 
 # ---------------------------------------------------------------------------
 # Public API
@@ -159,10 +206,8 @@ async def validate_response(challenge: dict, answer: str, context: dict) -> bool
 # ---------------------------------------------------------------------------
 
 def _static_challenge(round_num: int) -> dict:
-    idx = (round_num - 1) % len(_STATIC_CHALLENGES)
-    ch = dict(_STATIC_CHALLENGES[idx])
+    ch = _STATIC_TABLE[(round_num - 1) % len(_STATIC_TABLE)].copy()
     ch["round_num"] = round_num
-    ch["scenario"] = _SCENARIOS[(round_num - 1) % len(_SCENARIOS)]
     return ch
 
 
@@ -194,11 +239,11 @@ async def _claude_challenge(context: dict, round_num: int, prev_answer_hash: str
         response = await _get_claude_client().messages.create(
             model="claude-haiku-4-5-20251001",
             max_tokens=512,
-            system=_GEN_SYSTEM,
+            system=_GEN_SYSTEM_BLOCKS,
             messages=[{"role": "user", "content": user_msg}],
         )
         text = _strip_fences(response.content[0].text)
-        challenge = json.loads(text)
+        challenge = msgspec.structs.asdict(_challenge_decoder.decode(text))
     except Exception as exc:
         logger.warning("Claude challenge generation failed (%s), using static fallback", exc)
         return _static_challenge(round_num)
@@ -210,25 +255,26 @@ async def _claude_challenge(context: dict, round_num: int, prev_answer_hash: str
 
 async def _claude_validate(challenge: dict, answer: str) -> bool:
     user_msg = (
-        f"Challenge: {json.dumps(challenge)}\n"
+        f"Challenge: {orjson.dumps(challenge).decode()}\n"
         f"Respondent answer: {answer}"
     )
     try:
         response = await _get_claude_client().messages.create(
             model="claude-haiku-4-5-20251001",
             max_tokens=64,
-            system=_VAL_SYSTEM,
+            system=_VAL_SYSTEM_BLOCKS,
             messages=[{"role": "user", "content": user_msg}],
         )
         text = _strip_fences(response.content[0].text)
-        result = json.loads(text)
-        return bool(result.get("correct", False))
+        return _verdict_decoder.decode(text).correct
     except Exception:
         return _static_validate(challenge, answer)
 
 
 def _strip_fences(text: str) -> str:
     text = text.strip()
-    text = re.sub(r"^```(?:json)?\s*", "", text)
-    text = re.sub(r"\s*```$", "", text)
+    if text.startswith("```"):
+        text = _FENCE_OPEN.sub("", text, count=1)
+    if text.endswith("```"):
+        text = _FENCE_CLOSE.sub("", text, count=1)
     return text
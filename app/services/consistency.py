@@ -1,42 +1,39 @@
-"""numpy-based cross-session statistical analysis for Stage 4."""
-import json
-import numpy as np
+"""Cross-session statistical analysis for Stage 4, over rolling aggregates."""
 
 
-def analyze_sessions(sessions: list[dict]) -> dict:
+def _mean_std(n: int, total: float, total_sq: float) -> tuple[float, float]:
+    mean = total / n
+    var = max(total_sq / n - mean * mean, 0.0)
+    return mean, var ** 0.5
+
+
+def analyze_sessions(stats_row: dict) -> dict:
     """
-    Analyse timing patterns across sessions for an agent_id.
+    Analyse timing patterns for an agent from its agent_stats row —
+    sufficient statistics (count/sum/sum-of-squares) maintained on the
+    write path, so this is O(1) regardless of session history length.
     Returns {"consistent": bool, "reason": str, "stats": dict}.
     """
-    timestamps = np.array([s["timestamp"] for s in sessions], dtype=float)
-    intervals = np.diff(timestamps)
-
-    if len(intervals) == 0:
+    count = stats_row["count"]
+    if count < 2:
         return {"consistent": True, "reason": "insufficient_intervals", "stats": {}}
 
-    interval_mean = float(np.mean(intervals))
-    interval_std = float(np.std(intervals))
+    interval_mean, interval_std = _mean_std(
+        count - 1, stats_row["iv_sum"], stats_row["iv_sum_sq"]
+    )
     interval_cv = interval_std / interval_mean if interval_mean > 0 else 0.0
 
-    # Extract per-session timing data (stage1 PoW solve times)
-    stage1_times = []
-    for s in sessions:
-        try:
-            t = json.loads(s.get("timings", "{}"))
-            if "stage1" in t:
-                stage1_times.append(float(t["stage1"]))
-        except (json.JSONDecodeError, ValueError):
-            pass
-
     stats = {
-        "session_count": len(sessions),
+        "session_count": count,
         "interval_cv": interval_cv,
         "interval_mean_s": interval_mean,
     }
 
-    if len(stage1_times) >= 3:
-        s1_arr = np.array(stage1_times)
-        s1_cv = float(np.std(s1_arr) / np.mean(s1_arr)) if np.mean(s1_arr) > 0 else 0.0
+    if stats_row["s1_count"] >= 3:
+        s1_mean, s1_std = _mean_std(
+            stats_row["s1_count"], stats_row["s1_sum"], stats_row["s1_sum_sq"]
+        )
+        s1_cv = s1_std / s1_mean if s1_mean > 0 else 0.0
         stats["stage1_timing_cv"] = s1_cv
 
         # Agents should have very low PoW-solve CV (consistent compute)
@@ -48,11 +45,10 @@ def analyze_sessions(sessions: list[dict]) -> dict:
             }
 
     # Check for hour-of-day distribution (agents run 24/7; humans cluster)
-    hours = (timestamps % 86400) / 3600  # 0–24
-    hour_std = float(np.std(hours))
+    _, hour_std = _mean_std(count, stats_row["h_sum"], stats_row["h_sum_sq"])
     stats["hour_std"] = hour_std
 
-    if len(sessions) >= 10 and hour_std < 3.0:
+    if count >= 10 and hour_std < 3.0:
         return {
             "consistent": False,
             "reason": f"hour_std={hour_std:.2f} < 3.0 (sessions clustered in short window)",
@@ -0,0 +1,26 @@
+"""NumPy timing statistics for Stage 2's round-timing variance check.
+
+Stage 4 no longer uses this module — its analysis runs on the rolling
+agent_stats aggregates instead of per-session timing arrays.
+"""
+import numpy as np
+
+
+def mean_and_cv(values) -> tuple[float, float]:
+    """
+    Return (mean, coefficient of variation) over a 1-D sequence in one
+    vectorized pass. CV is 0.0 for empty input or non-positive mean.
+    """
+    arr = np.asarray(values, dtype=np.float64)
+    n = arr.size
+    if n == 0:
+        return 0.0, 0.0
+    # Fused reductions: sum and sum-of-squares in one cache pass each
+    # (arr @ arr hits the BLAS dot kernel), instead of the three passes
+    # that separate .mean()/.std() calls would make.
+    s1 = float(arr.sum())
+    s2 = float(arr @ arr)
+    mean = s1 / n
+    var = max(s2 / n - mean * mean, 0.0)
+    cv = (var ** 0.5) / mean if mean > 0 else 0.0
+    return mean, cv
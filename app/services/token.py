@@ -1,12 +1,26 @@
 """JWT encode/decode using PyJWT."""
+import base64
+import hashlib
+import hmac
 import time
+from functools import lru_cache
+
 import jwt
+import orjson
 
 from app.config import settings
 
 _ALGORITHM = "HS256"
 _EXPIRY_S = 3600
 
+# The header is constant and the HMAC key schedule only depends on the
+# secret, so both are prepared once at import. Per token we then encode
+# just the payload and .copy() the keyed HMAC context — same trick as
+# the SHA-256 midstate reuse in the PoW solver. Output is byte-for-byte
+# what jwt.encode produces for HS256.
+_HEADER_B64 = base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').rstrip(b"=")
+_HMAC_TEMPLATE = hmac.new(settings.jwt_secret.encode(), digestmod=hashlib.sha256)
+
 
 def create_token(agent_id: str, stages_passed: list[int]) -> str:
     now = int(time.time())
@@ -18,9 +32,28 @@ def create_token(agent_id: str, stages_passed: list[int]) -> str:
         "exp": now + _EXPIRY_S,
         "iat": now,
     }
-    return jwt.encode(payload, settings.jwt_secret, algorithm=_ALGORITHM)
+    payload_b64 = base64.urlsafe_b64encode(orjson.dumps(payload)).rstrip(b"=")
+    signing_input = _HEADER_B64 + b"." + payload_b64
+    h = _HMAC_TEMPLATE.copy()
+    h.update(signing_input)
+    signature = base64.urlsafe_b64encode(h.digest()).rstrip(b"=")
+    return (signing_input + b"." + signature).decode("ascii")
 
 
-def decode_token(token: str) -> dict:
-    """Decode and verify a JWT. Raises jwt.exceptions on invalid/expired."""
+@lru_cache(maxsize=4096)
+def _decode_cached(token: str) -> dict:
     return jwt.decode(token, settings.jwt_secret, algorithms=[_ALGORITHM])
+
+
+def decode_token(token: str) -> dict:
+    """Decode and verify a JWT. Raises jwt.exceptions on invalid/expired.
+
+    Tokens are self-contained, so the signature check is memoized; clients
+    polling /verify with the same token hit a dict lookup instead of an
+    HMAC-SHA256 round. Expiry is re-checked on every call since a cached
+    payload may have expired after it was first decoded.
+    """
+    payload = _decode_cached(token)
+    if "exp" in payload and payload["exp"] < time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+    return payload
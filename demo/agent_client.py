@@ -5,11 +5,11 @@ submits real env metadata. Should receive VERIFIED JWT.
 """
 import asyncio
 import hashlib
-import json
 import os
 import sys
 import time
 
+import orjson
 import psutil
 import websockets
 
@@ -27,56 +27,136 @@ _claude = None
 def _get_claude():
     global _claude
     if _claude is None and ANTHROPIC_API_KEY:
-        from anthropic import Anthropic
-        _claude = Anthropic(api_key=ANTHROPIC_API_KEY)
+        import httpx
+        from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+        # Explicit keep-alive pool over HTTP/2: rounds arrive seconds
+        # apart, and without a generous expiry each one can pay a fresh
+        # TLS handshake. Same shape as the server's challenge_gen client.
+        _claude = AsyncAnthropic(
+            api_key=ANTHROPIC_API_KEY,
+            http_client=DefaultAsyncHttpxClient(
+                http2=True,
+                limits=httpx.Limits(
+                    max_keepalive_connections=8, keepalive_expiry=60.0
+                ),
+                timeout=httpx.Timeout(30.0),
+            ),
+        )
     return _claude
 
 
 def solve_pow(nonce_hex: str, difficulty: int) -> str:
-    """Brute-force SHA-256 PoW."""
-    nonce = bytes.fromhex(nonce_hex)
-    prefix = "0" * difficulty
+    """
+    Brute-force SHA-256 PoW. The hash state over the fixed nonce is
+    computed once and copied per attempt, so each iteration only hashes
+    the counter bytes; the difficulty check runs on raw digest bytes
+    instead of a 64-char hexdigest.
+    """
+    # A JIT-compiled (e.g. numba prange) hand-written SHA-256 core was
+    # evaluated for sharding the search across threads, but a scalar
+    # Python-level SHA-256 — even JIT'd — doesn't beat OpenSSL's C
+    # implementation behind hashlib, and at the default difficulty the
+    # search (~100k attempts, <250ms) finishes before a JIT warms up.
+    # A dedicated C extension over EVP_sha256 was likewise passed on:
+    # hashlib already fronts the same OpenSSL code (SHA-NI dispatch
+    # included), so the loop below only pays the ~µs-scale call overhead
+    # per attempt, and this repo ships as plain scripts with no build
+    # step to host native code. Multi-lane SIMD (4-way SSE / 8-way AVX2
+    # hashing of independent counters) would help only on pre-SHA-NI
+    # CPUs and needs the same native build this repo avoids. Numbers:
+    # demo/bench_pow.py. Revisit only if difficulty grows by several
+    # nibbles.
+    base = hashlib.sha256(bytes.fromhex(nonce_hex))
+    copy = base.copy  # bound method hoisted out of the spin loop
+    prefix = b"\x00" * (difficulty // 2)
+    prefix_len = len(prefix)
+    odd_nibble = difficulty & 1
     counter = 0
     while True:
-        solution = str(counter)
-        if hashlib.sha256(nonce + solution.encode()).hexdigest().startswith(prefix):
-            return solution
+        h = copy()
+        # Fixed-width hex keeps the candidate printable (the server hashes
+        # the solution string as UTF-8) while the C-level %-format avoids
+        # the str(counter) + .encode() pair of allocations per attempt.
+        candidate = b"%016x" % counter
+        h.update(candidate)
+        digest = h.digest()
+        if digest[:prefix_len] == prefix and (not odd_nibble or digest[prefix_len] < 0x10):
+            return candidate.decode("ascii")
         counter += 1
 
 
-def get_env_metadata() -> dict:
-    """Collect real process/environment metadata for Stage 3."""
-    proc = psutil.Process()
-    try:
-        parent_name = psutil.Process(proc.ppid()).name().lower()
-    except Exception:
-        parent_name = "python"
+# Process-lifetime constants, resolved once at import: boot time cannot
+# change, and neither can our own Process handle or parent's name —
+# psutil.Process() walks /proc on every construction.
+_BOOT_TIME = psutil.boot_time()
+_PROC = psutil.Process()
+try:
+    _PARENT_NAME = psutil.Process(_PROC.ppid()).name().lower()
+except Exception:
+    _PARENT_NAME = "python"
+
+
+def _conn_count(proc: psutil.Process) -> int:
+    """Open-socket count for this process.
 
+    On Linux, count rows in /proc/self/net/tcp{,6} directly — psutil's
+    net_connections enumerates and parses every system connection, which
+    is orders of magnitude slower on busy hosts.
+    """
+    if sys.platform == "linux":
+        try:
+            count = 0
+            for path in ("/proc/self/net/tcp", "/proc/self/net/tcp6"):
+                with open(path, "rb") as f:
+                    count += sum(1 for _ in f) - 1  # minus header row
+            return count
+        except OSError:
+            pass
     try:
-        connections = len(proc.net_connections())
+        return len(proc.net_connections())
     except Exception:
-        connections = 0
+        return 0
+
+
+# Connection count barely moves between consecutive env_requests; gate
+# the /proc scan behind a 1s monotonic-clock cache.
+_conn_cache: tuple[float, int] = (-1.0, 0)
 
+
+def _conn_count_cached() -> int:
+    global _conn_cache
+    now = time.monotonic()
+    cached_at, count = _conn_cache
+    if now - cached_at >= 1.0:
+        count = _conn_count(_PROC)
+        _conn_cache = (now, count)
+    return count
+
+
+def get_env_metadata() -> dict:
+    """Collect real process/environment metadata for Stage 3."""
     return {
         "has_tty": False,               # Running headlessly
         "display_set": False,            # No graphical display
-        "uptime_seconds": time.time() - psutil.boot_time(),
-        "open_connections": connections,
-        "parent_process": parent_name,
+        "uptime_seconds": time.time() - _BOOT_TIME,
+        "open_connections": _conn_count_cached(),
+        "parent_process": _PARENT_NAME,
     }
 
 
-def answer_challenge(prompt: str, options: list[str]) -> str:
+async def answer_challenge(prompt: str, options: list[str]) -> str:
     """
     Answer a decision challenge.
     Uses Claude if API key is available, otherwise picks option A
     (correct for ~70%+ of static challenges).
+    The async client keeps the event loop free during the API round-trip,
+    so WebSocket keepalives keep flowing while Claude thinks.
     """
     claude = _get_claude()
     if claude:
         try:
             options_text = "\n".join(options) if options else "A, B, C, or D"
-            response = claude.messages.create(
+            response = await claude.messages.create(
                 model="claude-haiku-4-5-20251001",
                 max_tokens=128,
                 system=(
@@ -106,60 +186,104 @@ async def run():
 
     async with websockets.connect(uri) as ws:
         while True:
-            raw = await ws.recv()
-            msg = json.loads(raw)
-            msg_type = msg.get("type")
-
-            if msg_type == "pow_challenge":
-                print(f"[agent] Stage 1: PoW difficulty={msg['difficulty']}")
-                t0 = time.perf_counter()
-                solution = solve_pow(msg["nonce"], msg["difficulty"])
-                elapsed = time.perf_counter() - t0
-                print(f"[agent]   Solved in {elapsed*1000:.1f}ms: solution={solution}")
-                await ws.send(json.dumps({"solution": solution}))
-
-            elif msg_type == "decision_challenge":
-                round_num = msg.get("round", "?")
-                total = msg.get("total_rounds", "?")
-                print(f"[agent] Stage 2: Round {round_num}/{total}")
-                # Use mock_correct hint if present (server sends it when no API key is set)
-                mock_correct = msg.get("mock_correct")
-                if mock_correct:
-                    options = msg.get("options", [])
-                    correct_letter = mock_correct.strip().upper()[0]
-                    matching = next(
-                        (o for o in options if o.strip().upper().startswith(correct_letter)),
-                        f"{correct_letter}: correct option",
-                    )
-                    answer = matching
-                else:
-                    answer = answer_challenge(msg.get("prompt", ""), msg.get("options", []))
-                print(f"[agent]   Answer: {answer[:80]}")
-                await ws.send(json.dumps({"answer": answer}))
-
-            elif msg_type == "env_request":
-                print("[agent] Stage 3: Submitting env metadata")
-                env = get_env_metadata()
-                print(f"[agent]   has_tty={env['has_tty']} display={env['display_set']} "
-                      f"parent={env['parent_process']}")
-                await ws.send(json.dumps({"env": env}))
-
-            elif msg_type == "result":
-                verdict = msg.get("verdict")
-                if verdict == "ACCEPT":
-                    stages = msg.get("stages_passed", [])
-                    token = msg.get("token", "")
-                    print(f"\n[agent] VERIFIED ✓  stages={stages}")
-                    print(f"[agent] token: {token}")
-                else:
-                    reason = msg.get("reason", "unknown")
-                    print(f"\n[agent] REJECTED ✗  reason: {reason}")
+            msg = orjson.loads(await ws.recv())
+            handler = _HANDLERS.get(msg.get("type"))
+            if handler is not None and await handler(ws, msg):
                 break
 
-            elif msg_type == "error":
-                print(f"[agent] ERROR: {msg.get('message')}")
-                break
+
+async def _handle_pow(ws, msg) -> bool:
+    print(f"[agent] Stage 1: PoW difficulty={msg['difficulty']}")
+    t0 = time.perf_counter()
+    solution = solve_pow(msg["nonce"], msg["difficulty"])
+    elapsed = time.perf_counter() - t0
+    print(f"[agent]   Solved in {elapsed*1000:.1f}ms: solution={solution}")
+    await ws.send(orjson.dumps({"solution": solution}))
+    return False
+
+
+async def _handle_decision(ws, msg) -> bool:
+    round_num = msg.get("round", "?")
+    total = msg.get("total_rounds", "?")
+    print(f"[agent] Stage 2: Round {round_num}/{total}")
+    # Use mock hints if present (server sends them when no API key is set)
+    mock_correct = msg.get("mock_correct")
+    if mock_correct:
+        options = msg.get("options", [])
+        idx = msg.get("mock_correct_idx", -1)
+        if 0 <= idx < len(options):
+            # Direct index — no scan over the options
+            answer = options[idx]
+        else:
+            correct_letter = mock_correct.strip().upper()[0]
+            answer = next(
+                (o for o in options if o.strip().upper().startswith(correct_letter)),
+                f"{correct_letter}: correct option",
+            )
+    else:
+        answer = await answer_challenge(msg.get("prompt", ""), msg.get("options", []))
+    print(f"[agent]   Answer: {answer[:80]}")
+    await ws.send(orjson.dumps({"answer": answer}))
+    return False
+
+
+# Fixed-shape env frame, same splice-into-template idiom as the server's
+# protocol frames: the two booleans are constants of this client and the
+# parent name goes through orjson so arbitrary process names stay valid JSON.
+_ENV_TEMPLATE = (
+    b'{"env":{"has_tty":false,"display_set":false,"uptime_seconds":%.3f,'
+    b'"open_connections":%d,"parent_process":%b}}'
+)
+
+
+async def _handle_env(ws, msg) -> bool:
+    print("[agent] Stage 3: Submitting env metadata")
+    env = get_env_metadata()
+    print(f"[agent]   has_tty={env['has_tty']} display={env['display_set']} "
+          f"parent={env['parent_process']}")
+    await ws.send(_ENV_TEMPLATE % (
+        env["uptime_seconds"],
+        env["open_connections"],
+        orjson.dumps(env["parent_process"]),
+    ))
+    return False
+
+
+async def _handle_result(ws, msg) -> bool:
+    if msg.get("verdict") == "ACCEPT":
+        stages = msg.get("stages_passed", [])
+        token = msg.get("token", "")
+        print(f"\n[agent] VERIFIED ✓  stages={stages}")
+        print(f"[agent] token: {token}")
+    else:
+        reason = msg.get("reason", "unknown")
+        print(f"\n[agent] REJECTED ✗  reason: {reason}")
+    return True
+
+
+async def _handle_error(ws, msg) -> bool:
+    print(f"[agent] ERROR: {msg.get('message')}")
+    return True
+
+
+# O(1) type → handler dispatch; each handler returns True when the
+# session is finished and the recv loop should exit.
+_HANDLERS = {
+    "pow_challenge": _handle_pow,
+    "decision_challenge": _handle_decision,
+    "env_request": _handle_env,
+    "result": _handle_result,
+    "error": _handle_error,
+}
 
 
 if __name__ == "__main__":
+    # uvloop speeds up the WS event loop noticeably; harmless to skip on
+    # platforms that don't ship it (USE_UVLOOP=0 opts out explicitly).
+    if os.getenv("USE_UVLOOP", "1") == "1":
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
     asyncio.run(run())
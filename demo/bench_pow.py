@@ -0,0 +1,67 @@
+"""
+Micro-benchmark for the PoW solver: measures attempts/sec and per-attempt
+latency of solve_pow so kernel experiments (JIT, SIMD, SHA-NI bindings)
+can be judged against the hashlib baseline on the target machine.
+
+Usage: python demo/bench_pow.py [difficulty] [seconds]
+"""
+import hashlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from agent_client import solve_pow  # noqa: E402
+
+
+def bench_raw_hash(seconds: float) -> float:
+    """Attempts/sec of the midstate-copy inner step, without the search."""
+    base = hashlib.sha256(os.urandom(16))
+    copy = base.copy
+    n = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for counter in range(n, n + 1000):
+            h = copy()
+            h.update(b"%016x" % counter)
+            h.digest()
+        n += 1000
+    return n / seconds
+
+
+def bench_solver(difficulty: int, seconds: float) -> tuple[int, float]:
+    """(solves, total_s) for repeated fresh-nonce searches."""
+    solves = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        solve_pow(os.urandom(16).hex(), difficulty)
+        solves += 1
+    return solves, time.perf_counter() - t0
+
+
+def _sha_ni_available() -> bool:
+    """Whether the CPU advertises SHA extensions (Linux only).
+
+    hashlib goes through OpenSSL, which dispatches to the SHA-NI rounds
+    at runtime when the flag is present — no Python-side action needed.
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            return "sha_ni" in f.read()
+    except OSError:
+        return False
+
+
+if __name__ == "__main__":
+    difficulty = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 2.0
+
+    print(f"sha_ni: {'yes' if _sha_ni_available() else 'no'} "
+          "(OpenSSL auto-dispatches when available)")
+
+    rate = bench_raw_hash(seconds)
+    print(f"inner step: {rate:,.0f} attempts/s ({1e9 / rate:,.0f} ns/attempt)")
+
+    solves, elapsed = bench_solver(difficulty, seconds)
+    print(f"difficulty {difficulty}: {solves} solves in {elapsed:.2f}s "
+          f"({elapsed / solves * 1000:.1f} ms/solve)")
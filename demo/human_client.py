@@ -3,11 +3,11 @@ Simulated human client: sleeps 3s before responding (exceeds PoW timeout).
 Should print REJECTED ✗ stage1_timeout.
 """
 import asyncio
-import json
 import os
 import sys
 import time
 
+import orjson
 import websockets
 
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -15,6 +15,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 WS_URL = os.getenv("WS_URL", "ws://localhost:8000/ws/verify")
 HUMAN_ID = os.getenv("HUMAN_ID", "simulated-human-001")
 
+# The too-slow "solution" never varies — freeze the encoded frame once.
+_TIMEOUT_PAYLOAD = b'{"solution":"0"}'
+
 
 async def run():
     print(f"[human] Connecting to {WS_URL}?agent_id={HUMAN_ID}")
@@ -23,31 +26,52 @@ async def run():
     try:
         async with websockets.connect(uri) as ws:
             while True:
-                raw = await ws.recv()
-                msg = json.loads(raw)
-                msg_type = msg.get("type")
-
-                if msg_type == "pow_challenge":
-                    print(f"[human] Stage 1: Got PoW challenge, thinking for 3 seconds...")
-                    await asyncio.sleep(3.0)  # Way too slow — will timeout
-                    await ws.send(json.dumps({"solution": "0"}))
-
-                elif msg_type == "result":
-                    verdict = msg.get("verdict")
-                    if verdict == "ACCEPT":
-                        print(f"\n[human] VERIFIED ✓ (unexpected)")
-                    else:
-                        reason = msg.get("reason", "unknown")
-                        print(f"\n[human] REJECTED ✗  reason: {reason}")
-                    break
-
-                elif msg_type == "error":
-                    print(f"[human] ERROR: {msg.get('message')}")
+                msg = orjson.loads(await ws.recv())
+                handler = _HANDLERS.get(msg.get("type"))
+                if handler is not None and await handler(ws, msg):
                     break
 
     except websockets.exceptions.ConnectionClosedError as e:
         print(f"\n[human] REJECTED ✗  Connection closed by server: {e.reason or 'stage1_timeout'}")
 
 
+async def _handle_pow(ws, msg) -> bool:
+    print(f"[human] Stage 1: Got PoW challenge, thinking for 3 seconds...")
+    await asyncio.sleep(3.0)  # Way too slow — will timeout
+    await ws.send(_TIMEOUT_PAYLOAD)
+    return False
+
+
+async def _handle_result(ws, msg) -> bool:
+    if msg.get("verdict") == "ACCEPT":
+        print(f"\n[human] VERIFIED ✓ (unexpected)")
+    else:
+        reason = msg.get("reason", "unknown")
+        print(f"\n[human] REJECTED ✗  reason: {reason}")
+    return True
+
+
+async def _handle_error(ws, msg) -> bool:
+    print(f"[human] ERROR: {msg.get('message')}")
+    return True
+
+
+# Same type → handler dispatch as agent_client: handlers return True
+# when the session is finished and the recv loop should exit.
+_HANDLERS = {
+    "pow_challenge": _handle_pow,
+    "result": _handle_result,
+    "error": _handle_error,
+}
+
+
 if __name__ == "__main__":
+    # uvloop speeds up the WS event loop noticeably; harmless to skip on
+    # platforms that don't ship it (USE_UVLOOP=0 opts out explicitly).
+    if os.getenv("USE_UVLOOP", "1") == "1":
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
     asyncio.run(run())
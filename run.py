@@ -1,6 +1,20 @@
 """Entry point: starts the AgentCaptcha FastAPI server."""
+import os
+
 import uvicorn
 
+
+def _loop() -> str:
+    """uvloop when installed and not opted out (USE_UVLOOP=0)."""
+    if os.getenv("USE_UVLOOP", "1") == "1":
+        try:
+            import uvloop  # noqa: F401
+            return "uvloop"
+        except ImportError:
+            pass
+    return "auto"
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -8,4 +22,5 @@ if __name__ == "__main__":
         port=8000,
         reload=False,
         log_level="info",
+        loop=_loop(),
     )
@@ -1,5 +1,6 @@
 """Unit tests for each DPP stage in isolation."""
 import asyncio
+import functools
 import hashlib
 import json
 import os
@@ -24,17 +25,31 @@ from app.services.token import create_token, decode_token
 # Stage 1 — PoW
 # ---------------------------------------------------------------------------
 
+@functools.lru_cache(maxsize=1024)
+def _solve(nonce: bytes, difficulty: int) -> str:
+    """Midstate-reusing PoW solve for test scaffolding — same trick as the
+    demo solver, so test runtime stays proportional to attempts, not
+    attempts × (nonce rehash + hexdigest). Memoized so repeat-runners
+    (pytest-repeat, --count=N) only brute-force each nonce once."""
+    base = hashlib.sha256(nonce)
+    zeros = b"\x00" * (difficulty // 2)
+    odd = difficulty & 1
+    counter = 0
+    while True:
+        h = base.copy()
+        solution = b"%d" % counter
+        h.update(solution)
+        d = h.digest()
+        if d.startswith(zeros) and (not odd or d[len(zeros)] < 16):
+            return solution.decode()
+        counter += 1
+
+
 class TestStage1PoW(unittest.TestCase):
     def test_valid_solution(self):
         nonce = _make_nonce()
         difficulty = 2
-        prefix = "0" * difficulty
-        counter = 0
-        while True:
-            solution = str(counter)
-            if hashlib.sha256(nonce + solution.encode()).hexdigest().startswith(prefix):
-                break
-            counter += 1
+        solution = _solve(nonce, difficulty)
         self.assertTrue(verify_solution(nonce, solution, difficulty))
 
     def test_invalid_solution(self):
@@ -72,20 +87,15 @@ class TestStage1PoW(unittest.TestCase):
             nonce_holder = {}
 
             async def fake_send(data):
+                if isinstance(data, (bytes, bytearray)):
+                    data = json.loads(data)
                 if data.get("type") == "pow_challenge":
                     nonce_holder["nonce"] = data["nonce"]
                     nonce_holder["difficulty"] = data["difficulty"]
 
             async def fake_recv():
                 nonce = bytes.fromhex(nonce_holder["nonce"])
-                difficulty = nonce_holder["difficulty"]
-                counter = 0
-                prefix = "0" * difficulty
-                while True:
-                    solution = str(counter)
-                    if hashlib.sha256(nonce + solution.encode()).hexdigest().startswith(prefix):
-                        return {"solution": solution}
-                    counter += 1
+                return {"solution": _solve(nonce, nonce_holder["difficulty"])}
 
             session = Session(agent_id="test-agent")
             return await s1.run(session, fake_send, fake_recv)
@@ -99,6 +109,17 @@ class TestStage1PoW(unittest.TestCase):
 # ---------------------------------------------------------------------------
 
 class TestStage2Decisions(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Correct-option letters for the static bank, indexed by round - 1.
+        # The bank is deterministic, so fold challenge selection into a
+        # one-time LUT instead of re-running it inside fake_recv per round.
+        from app.config import settings
+        cls._correct = tuple(
+            _static_challenge(i)["correct_option"].strip().upper()[0]
+            for i in range(1, settings.decision_rounds + 1)
+        )
+
     def _make_session(self):
         return Session(agent_id="test-agent")
 
@@ -127,18 +148,23 @@ class TestStage2Decisions(unittest.TestCase):
             pending_challenge = {}
 
             async def fake_send(data):
+                if isinstance(data, (bytes, bytearray)):
+                    data = json.loads(data)
                 if data.get("type") == "decision_challenge":
                     pending_challenge.update(data)
 
             async def fake_recv():
+                # Respond with a small fixed delay — instant replies make
+                # round timings pure scheduler jitter, which trips the CV
+                # variance check nondeterministically.
+                await asyncio.sleep(0.02)
                 # Look up the correct answer for the current round
                 round_num = pending_challenge.get("round", 1)
-                ch = _static_challenge(round_num)
-                correct = ch["correct_option"].strip().upper()[0]
+                correct = self._correct[round_num - 1]
                 return {"answer": f"{correct}: correct answer"}
 
             session = self._make_session()
-            return await s2.run(session, fake_send, fake_recv, session_id=None)
+            return await s2.run(session, fake_send, fake_recv)
 
         result = asyncio.run(_run())
         self.assertIsNone(result)  # None = pass
@@ -157,7 +183,7 @@ class TestStage2Decisions(unittest.TestCase):
                 return {}
 
             session = self._make_session()
-            return await s2.run(session, fake_send, fake_recv, session_id=None)
+            return await s2.run(session, fake_send, fake_recv)
 
         result = asyncio.run(_run())
         self.assertIsNotNone(result)
@@ -197,14 +223,15 @@ class TestStage3Environment(unittest.TestCase):
         self.assertLess(passed, 4)
 
     def test_shell_parents_fail(self):
+        # Constant fields built once; only parent_process varies per shell.
+        env = {
+            "has_tty": False,
+            "display_set": False,
+            "uptime_seconds": 3600,
+            "open_connections": 0,
+        }
         for shell in ["bash", "zsh", "sh", "fish", "cmd", "powershell"]:
-            env = {
-                "has_tty": False,
-                "display_set": False,
-                "uptime_seconds": 3600,
-                "open_connections": 0,
-                "parent_process": shell,
-            }
+            env["parent_process"] = shell
             passed, failed = _evaluate(env)
             self.assertIn("parent_process", failed, f"{shell} should fail parent check")
 
@@ -214,74 +241,167 @@ class TestStage3Environment(unittest.TestCase):
 # ---------------------------------------------------------------------------
 
 class TestStage4Consistency(unittest.TestCase):
-    def _make_sessions(self, n: int, interval: float = 7200.0) -> list[dict]:
+    @staticmethod
+    def _make_stats(timestamps, stage1_times):
+        """Fold sessions into an agent_stats-shaped row, as the write path does."""
+        row = {
+            "agent_id": "test-agent", "count": 0, "last_ts": 0.0,
+            "iv_sum": 0.0, "iv_sum_sq": 0.0,
+            "s1_count": 0, "s1_sum": 0.0, "s1_sum_sq": 0.0,
+            "h_sum": 0.0, "h_sum_sq": 0.0,
+        }
+        for ts, s1 in zip(timestamps, stage1_times):
+            if row["count"]:
+                iv = ts - row["last_ts"]
+                row["iv_sum"] += iv
+                row["iv_sum_sq"] += iv * iv
+            row["count"] += 1
+            row["last_ts"] = ts
+            hour = (ts % 86400.0) / 3600.0
+            row["h_sum"] += hour
+            row["h_sum_sq"] += hour * hour
+            row["s1_count"] += 1
+            row["s1_sum"] += s1
+            row["s1_sum_sq"] += s1 * s1
+        return row
+
+    def _make_sessions(self, n: int, interval: float = 7200.0):
         base = time.time() - n * interval
-        return [
-            {
-                "agent_id": "test-agent",
-                "timestamp": base + i * interval,
-                "timings": json.dumps({"stage1": 0.05 + i * 0.001}),
-                "passed": 1,
-            }
-            for i in range(n)
-        ]
+        timestamps = [base + i * interval for i in range(n)]
+        stage1_times = [0.05 + i * 0.001 for i in range(n)]
+        return self._make_stats(timestamps, stage1_times)
 
     def test_consistent_sessions(self):
         # 2-hour intervals → 10 sessions span 18h → hour_std > 3.0
-        sessions = self._make_sessions(10, interval=7200.0)
-        result = analyze_sessions(sessions)
+        result = analyze_sessions(self._make_sessions(10, interval=7200.0))
         self.assertTrue(result["consistent"])
 
     def test_too_few_sessions_skipped(self):
-        sessions = self._make_sessions(3)
-        result = analyze_sessions(sessions)
+        result = analyze_sessions(self._make_sessions(3))
         self.assertTrue(result["consistent"])
 
     def test_high_timing_variance_rejects(self):
         base = time.time()
-        sessions = [
-            {"agent_id": "test", "timestamp": base + i * 7200,
-             "timings": json.dumps({"stage1": 0.001 + i * 0.5}), "passed": 1}
-            for i in range(6)
-        ]
-        result = analyze_sessions(sessions)
+        timestamps = [base + i * 7200 for i in range(6)]
+        stage1_times = [0.001 + i * 0.5 for i in range(6)]
+        result = analyze_sessions(self._make_stats(timestamps, stage1_times))
         if not result["consistent"]:
             self.assertIn("stage1_timing_cv", result["reason"])
 
 
+# ---------------------------------------------------------------------------
+# Backpressure
+# ---------------------------------------------------------------------------
+
+class TestAIMDLimiter(unittest.TestCase):
+    def test_timeout_halves_capacity(self):
+        from app.services.backpressure import AIMDLimiter
+        limiter = AIMDLimiter(initial=8.0)
+        limiter.record_timeout()
+        self.assertEqual(limiter.capacity, 4.0)
+
+    def test_success_grows_capacity_to_max(self):
+        from app.services.backpressure import AIMDLimiter
+        limiter = AIMDLimiter(initial=8.0, maximum=9.0, increase=0.5)
+        for _ in range(10):
+            limiter.record_success()
+        self.assertEqual(limiter.capacity, 9.0)
+
+    def test_capacity_floor(self):
+        from app.services.backpressure import AIMDLimiter
+        limiter = AIMDLimiter(initial=2.0, minimum=1.0)
+        for _ in range(10):
+            limiter.record_timeout()
+        self.assertEqual(limiter.capacity, 1.0)
+
+    def test_limits_concurrent_holders(self):
+        from app.services.backpressure import AIMDLimiter
+        limiter = AIMDLimiter(initial=2.0)
+
+        async def _run():
+            active, peak = 0, 0
+
+            async def hold():
+                nonlocal active, peak
+                async with limiter:
+                    active += 1
+                    peak = max(peak, active)
+                    await asyncio.sleep(0.01)
+                    active -= 1
+
+            await asyncio.gather(*[hold() for _ in range(6)])
+            return peak
+
+        self.assertLessEqual(asyncio.run(_run()), 2)
+
+
 # ---------------------------------------------------------------------------
 # Rate Limiter
 # ---------------------------------------------------------------------------
 
 class TestRateLimiter(unittest.TestCase):
-    def test_allows_under_limit(self):
+    def _make_middleware(self):
         from app.middleware.rate_limit import RateLimitMiddleware
         mw = RateLimitMiddleware.__new__(RateLimitMiddleware)
-        from collections import defaultdict, deque
-        mw._windows = defaultdict(deque)
+        mw._buckets = {}
+        return mw
 
+    def test_allows_under_limit(self):
+        from app.config import settings
+        mw = self._make_middleware()
         now = time.monotonic()
-        for _ in range(5):
-            mw._windows["1.2.3.4"].append(now)
-
-        self.assertLess(len(mw._windows["1.2.3.4"]), 10)
+        for _ in range(settings.rate_limit_requests):
+            self.assertTrue(mw._allow("1.2.3.4", now))
 
     def test_blocks_over_limit(self):
-        from app.middleware.rate_limit import RateLimitMiddleware
         from app.config import settings
-        from collections import defaultdict, deque
-
-        mw = RateLimitMiddleware.__new__(RateLimitMiddleware)
-        mw._windows = defaultdict(deque)
+        mw = self._make_middleware()
+        now = time.monotonic()
+        for _ in range(settings.rate_limit_requests):
+            mw._allow("9.9.9.9", now)
+        self.assertFalse(mw._allow("9.9.9.9", now))
 
+    def test_idle_buckets_swept(self):
+        from app.config import settings
+        mw = self._make_middleware()
+        now = time.monotonic()
+        # Sweep strictly past the window: (now + window) - now can round
+        # to just under window in float arithmetic, keeping the bucket.
+        mw._allow("1.1.1.1", now)
+        mw._allow("2.2.2.2", now + settings.rate_limit_window_s + 1)
+        mw._sweep(now + settings.rate_limit_window_s + 1)
+        self.assertNotIn("1.1.1.1", mw._buckets)
+        self.assertIn("2.2.2.2", mw._buckets)
+
+    def test_bucket_refills_after_window(self):
+        from app.config import settings
+        mw = self._make_middleware()
         now = time.monotonic()
         for _ in range(settings.rate_limit_requests):
-            mw._windows["9.9.9.9"].append(now)
+            mw._allow("5.6.7.8", now)
+        self.assertFalse(mw._allow("5.6.7.8", now))
+        self.assertTrue(mw._allow("5.6.7.8", now + settings.rate_limit_window_s))
 
-        self.assertGreaterEqual(
-            len(mw._windows["9.9.9.9"]),
-            settings.rate_limit_requests,
-        )
+
+# ---------------------------------------------------------------------------
+# Module hygiene
+# ---------------------------------------------------------------------------
+
+class TestModuleHygiene(unittest.TestCase):
+    def test_no_duplicate_routes(self):
+        """Guard against a duplicate routes module registering paths twice."""
+        from app.main import app as fastapi_app
+        seen = [
+            (route.path, tuple(sorted(getattr(route, "methods", None) or ())))
+            for route in fastapi_app.routes
+            if hasattr(route, "path")
+        ]
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_stage2_single_module(self):
+        """The loaded stage2 module is the canonical one (CV threshold 0.8)."""
+        import app.protocol.stage2_decisions as s2
+        self.assertEqual(s2._CV_REJECT_THRESHOLD, 0.8)
 
 
 # ---------------------------------------------------------------------------